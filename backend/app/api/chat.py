@@ -9,6 +9,7 @@ from ..database import get_db
 from ..models import ChatSession, Message
 from ..services.ai_service import ai_service
 from ..services.search_service import search_service
+from ..services.cache_service import listing_cache
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -56,6 +57,7 @@ async def create_chat_completion(
             await db.commit()
             await db.refresh(new_session)
             session_id = new_session.id
+            listing_cache.invalidate_sessions()
 
         # 执行网络搜索
         search_results = await search_service.search(user_message)
@@ -96,6 +98,7 @@ async def create_chat_completion(
         )
         db.add(assistant_msg)
         await db.commit()
+        listing_cache.invalidate_session(session_id)
         
         # 返回 ChatGPT API 兼容的响应格式
         import time
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from typing import BinaryIO, Dict, Optional
+import logging
+import tempfile
+
+from ..services.history_service import history_service
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+async def _spool_body(request: Request, file: BinaryIO):
+    """
+    先把请求体完整写入临时文件，避免上传过程中长时间持有写事务
+    """
+    async for chunk in request.stream():
+        file.write(chunk)
+    file.seek(0)
+
+@router.get("/export/")
+async def export_history(session_id: Optional[int] = None):
+    """
+    以 NDJSON 流式导出会话及消息，可通过 session_id 只导出单个会话
+    """
+    logger.info(f"[History] Exporting history, session_id={session_id}")
+    filename = f"session_{session_id}.ndjson" if session_id is not None else "history.ndjson"
+    return StreamingResponse(
+        history_service.export_ndjson(session_id),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/import/")
+async def import_history(request: Request) -> Dict[str, int]:
+    """
+    从 NDJSON 请求体批量导入会话及消息（与 /export/ 格式一致），先整体校验再分批提交
+    """
+    logger.info("[History] Importing history")
+    with tempfile.TemporaryFile() as file:
+        await _spool_body(request, file)
+        return await history_service.import_ndjson(file)
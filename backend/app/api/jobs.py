@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, Optional
+from pydantic import BaseModel
+import asyncio
+import json
+import logging
+
+from ..database import get_db, AsyncSessionLocal
+from ..services.job_service import job_service, serialize_job, TERMINAL_STATUSES
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# SSE 连接保活间隔（秒）
+KEEPALIVE_INTERVAL = 15.0
+
+class ChatJobRequest(BaseModel):
+    message: str
+    model: Optional[str] = None
+    session_id: Optional[int] = None
+
+def _sse_event(data: Dict[str, Any]) -> str:
+    return f"event: {data['status']}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/jobs/", status_code=202)
+async def submit_chat_job(
+    request: ChatJobRequest,
+    db: AsyncSession = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    提交聊天任务，立即返回任务 ID，由后台 worker 处理
+    """
+    logger.info(f"[Jobs] Received job request: {request}")
+    job = await job_service.submit(
+        db,
+        request.message,
+        model=request.model,
+        session_id=request.session_id
+    )
+    return serialize_job(job)
+
+@router.get("/jobs/{job_id}")
+async def get_chat_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    轮询任务状态，完成后 result 字段包含与 /chat/ 相同的响应
+    """
+    job = await job_service.get_job(db, job_id)
+    return serialize_job(job)
+
+@router.get("/jobs/{job_id}/events")
+async def subscribe_chat_job(job_id: str):
+    """
+    通过 SSE 订阅任务状态变化，任务结束后关闭连接
+    """
+    # 先订阅再读取当前状态，避免错过两者之间的状态变化
+    queue = job_service.subscribe(job_id)
+    try:
+        async with AsyncSessionLocal() as db:
+            job = await job_service.get_job(db, job_id)
+            current = serialize_job(job)
+    except Exception:
+        job_service.unsubscribe(job_id, queue)
+        raise
+
+    async def event_stream():
+        try:
+            data = current
+            yield _sse_event(data)
+            while data["status"] not in TERMINAL_STATUSES:
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse_event(data)
+        finally:
+            job_service.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -16,6 +16,13 @@ class Settings(BaseSettings):
     # Default Model
     DEFAULT_MODEL: str = "Pro/deepseek-ai/DeepSeek-R1"  # 使用 Pro 版本的 DeepSeek R1 作为默认模型
     
+    # Chat Job Worker Settings
+    CHAT_JOB_WORKERS: int = 2  # 同时处理的聊天任务数
+    CHAT_JOB_QUEUE_SIZE: int = 100  # 排队中的任务上限，超出后拒绝提交
+    
+    # Listing Cache Settings
+    LISTING_CACHE_SIZE: int = 256  # 进程内缓存的列表响应数量上限
+    
     # App Settings
     APP_NAME: str = "Personal Knowledge Assistant"
     DEBUG: bool = False
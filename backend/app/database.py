@@ -24,6 +24,12 @@ async def init_db():
     """
     初始化数据库，创建所有表
     """
+    if engine.dialect.name == "sqlite":
+        # WAL 模式下读写互不阻塞，导出的长时间读取不会让聊天写入报 database is locked
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            logger.info(f"SQLite journal mode: {result.scalar()}")
+
     async with engine.begin() as conn:
         logger.info("Creating database tables...")
         await conn.run_sync(Base.metadata.create_all)
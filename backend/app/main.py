@@ -1,7 +1,8 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Hashable, Awaitable, Callable, Any
 import json
 from pydantic import BaseModel
 import logging
@@ -14,9 +15,14 @@ from .database import get_db, init_db
 from .models import ChatSession, Message
 from .services.ai_service import ai_service
 from .services.search_service import search_service
+from .services.chat_service import chat_service
+from .services.job_service import job_service
+from .services.cache_service import listing_cache, SESSIONS_KEY, messages_key
 from .config import settings
 from sqlalchemy import select
 from .api.chat import router as chat_router
+from .api.jobs import router as jobs_router
+from .api.history import router as history_router
 
 app = FastAPI(title="Personal Knowledge Assistant")
 
@@ -38,10 +44,24 @@ async def startup_event():
     logger.info("Initializing database...")
     await init_db()
     logger.info("Database initialized successfully")
+    await job_service.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    在应用关闭时停止后台任务 worker
+    """
+    await job_service.stop()
 
 # 包含 ChatGPT 兼容的路由
 app.include_router(chat_router)
 
+# 异步聊天任务路由（提交 / 轮询 / SSE 订阅）
+app.include_router(jobs_router)
+
+# 会话历史导出 / 导入路由
+app.include_router(history_router)
+
 # 保留原有的路由用于兼容性
 class ChatRequest(BaseModel):
     message: str
@@ -64,69 +84,13 @@ async def chat(
 ):
     logger.info(f"[Step 1] Received chat request: {request}")
     
-    # Create new session if none exists
-    if not request.session_id:
-        new_session = ChatSession(title=request.message[:50])  # Use first 50 chars as title
-        db.add(new_session)
-        await db.commit()
-        await db.refresh(new_session)
-        request.session_id = new_session.id
-        logger.info(f"[Step 2] Created new session with ID: {request.session_id}")
-
-    # Perform web search
-    logger.info("[Step 3] Starting web search...")
-    search_results = await search_service.search(request.message)
-    logger.info(f"[Step 4] Completed web search, got {len(search_results)} results")
-    
-    # Store user message
-    user_message = Message(
-        session_id=request.session_id,
-        role="user",
-        content=request.message,
-        search_results=json.dumps(search_results)
-    )
-    db.add(user_message)
-    logger.info("[Step 5] Stored user message")
-    
-    # Prepare context for AI
-    context = f"Web search results:\n"
-    # 只使用前3条最相关的搜索结果
-    for i, result in enumerate(search_results[:3]):
-        context += f"{i+1}. {result['title']}\n{result['snippet']}\n\n"
-    
-    # Get AI response
-    messages = [
-        {"role": "system", "content": "You are a helpful AI assistant. Use the provided web search results to help answer questions accurately. Keep your response concise and focused."},
-        {"role": "user", "content": f"Context: {context}\n\nQuestion: {request.message}"}
-    ]
-    
     try:
-        logger.info(f"[Step 6] Starting AI request using model: {request.model or settings.DEFAULT_MODEL}")
-        logger.info(f"[Step 6.1] Context length: {len(context)} chars")
-        ai_response = await ai_service.get_ai_response(messages, request.model)
-        logger.info("[Step 7] Received AI response")
-        
-        # Store AI response
-        assistant_message = Message(
-            session_id=request.session_id,
-            role="assistant",
-            content=ai_response,
-            ai_model_response=json.dumps({
-                "response": ai_response,
-                "model": request.model or settings.DEFAULT_MODEL
-            })
+        return await chat_service.process_chat(
+            db,
+            request.message,
+            model=request.model,
+            session_id=request.session_id
         )
-        db.add(assistant_message)
-        
-        await db.commit()
-        logger.info("[Step 8] Stored AI response in database")
-        
-        return {
-            "session_id": request.session_id,
-            "response": ai_response,
-            "search_results": search_results,
-            "model": request.model or settings.DEFAULT_MODEL
-        }
     except HTTPException as e:
         logger.error(f"[Error] HTTP error in step 6-8: {str(e)}")
         raise e
@@ -137,23 +101,60 @@ async def chat(
             detail=f"An error occurred while processing your request: {str(e)}"
         )
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # 弱比较：忽略 W/ 前缀
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    candidates = [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+    return etag in candidates
+
+async def _cached_listing(
+    request: Request,
+    key: Hashable,
+    load: Callable[[], Awaitable[Any]]
+) -> Response:
+    """
+    根据 ETag 返回 304，或从进程内缓存 / 数据库返回列表
+    """
+    # 必须在查询数据库之前读取版本号，写入方在提交后才会更新版本
+    etag = listing_cache.etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = listing_cache.get(key, etag)
+    if body is None:
+        body = json.dumps(jsonable_encoder(await load())).encode("utf-8")
+        listing_cache.put(key, etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/sessions/")
-async def get_sessions(db: AsyncSession = Depends(get_db)):
+async def get_sessions(request: Request, db: AsyncSession = Depends(get_db)):
     logger.info("Getting all sessions")
-    result = await db.execute(select(ChatSession).order_by(ChatSession.created_at.desc()))
-    sessions = result.scalars().all()
-    return sessions
+
+    async def load():
+        result = await db.execute(select(ChatSession).order_by(ChatSession.created_at.desc()))
+        return result.scalars().all()
+
+    return await _cached_listing(request, SESSIONS_KEY, load)
 
 @app.get("/sessions/{session_id}/messages/")
-async def get_session_messages(session_id: int, db: AsyncSession = Depends(get_db)):
+async def get_session_messages(session_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     logger.info(f"Getting messages for session {session_id}")
-    result = await db.execute(
-        select(Message)
-        .where(Message.session_id == session_id)
-        .order_by(Message.created_at)
-    )
-    messages = result.scalars().all()
-    return messages
+
+    async def load():
+        result = await db.execute(
+            select(Message)
+            .where(Message.session_id == session_id)
+            .order_by(Message.created_at)
+        )
+        return result.scalars().all()
+
+    return await _cached_listing(request, messages_key(session_id), load)
 
 @app.post("/search")
 async def search(request: SearchRequest):
@@ -22,4 +22,20 @@ class Message(Base):
     
     # Optional fields for search results and AI responses
     search_results = Column(Text, nullable=True)
-    ai_model_response = Column(Text, nullable=True) 
\ No newline at end of file
+    ai_model_response = Column(Text, nullable=True)
+
+class ChatJob(Base):
+    __tablename__ = "chat_jobs"
+    
+    id = Column(String(36), primary_key=True, index=True)  # UUID
+    status = Column(String(20), index=True, default="pending")  # pending, running, completed, failed
+    message = Column(Text)
+    model = Column(String(255), nullable=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # JSON encoded chat result on success, error detail on failure
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+import logging
+import uuid
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_KEY = ("sessions",)
+
+def messages_key(session_id: int) -> Tuple[str, int]:
+    return ("messages", session_id)
+
+class ListingCache:
+    """
+    In-process version counters and serialized responses for the listing endpoints.
+    Versions are bumped by the write paths after commit, so each worker process
+    keeps its own counters and cache.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # 进程启动标识，避免重启后计数器归零导致 ETag 与旧数据冲突
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._generation = 0
+        self._versions: Dict[Hashable, int] = {}
+        self._responses: "OrderedDict[Hashable, Tuple[str, bytes]]" = OrderedDict()
+
+    def etag(self, key: Hashable) -> str:
+        """
+        Current ETag for a listing, read it before querying the database
+        """
+        return f'"{self._boot_id}-{self._generation}-{self._versions.get(key, 0)}"'
+
+    def get(self, key: Hashable, etag: str) -> Optional[bytes]:
+        """
+        Cached response body if it was stored under the given ETag
+        """
+        entry = self._responses.get(key)
+        if entry is None or entry[0] != etag:
+            return None
+        self._responses.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, etag: str, body: bytes):
+        """
+        Store a response body, skipped if a write happened while it was built
+        """
+        if etag != self.etag(key):
+            return
+        self._responses[key] = (etag, body)
+        self._responses.move_to_end(key)
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+
+    def invalidate_sessions(self):
+        """
+        Call after a session has been created
+        """
+        self._bump(SESSIONS_KEY)
+
+    def invalidate_session(self, session_id: int):
+        """
+        Call after messages of a session have been committed
+        """
+        self._bump(messages_key(session_id))
+
+    def invalidate_all(self):
+        """
+        Call after bulk writes that touch many sessions
+        """
+        self._generation += 1
+        self._versions.clear()
+        self._responses.clear()
+        logger.info("[Cache] Cleared all listing caches")
+
+    def _bump(self, key: Hashable):
+        self._versions[key] = self._versions.get(key, 0) + 1
+        self._responses.pop(key, None)
+
+listing_cache = ListingCache(settings.LISTING_CACHE_SIZE)
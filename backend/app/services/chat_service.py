@@ -0,0 +1,108 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Callable, Dict, Any, Optional
+import json
+import logging
+
+from ..config import settings
+from ..models import ChatSession, Message
+from .ai_service import ai_service
+from .search_service import search_service
+from .cache_service import listing_cache
+
+logger = logging.getLogger(__name__)
+
+class ChatService:
+    async def process_chat(
+        self,
+        db: AsyncSession,
+        message: str,
+        model: Optional[str] = None,
+        session_id: Optional[int] = None,
+        on_session_created: Optional[Callable[[int], None]] = None,
+        before_commit: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run one chat turn: search, call the model and store both messages
+        Args:
+            db: Database session used to persist the turn
+            message: User message
+            model: Name of the model to use
+            session_id: Existing session ID, a new session is created if empty
+            on_session_created: Called with the new session ID before it is committed
+            before_commit: Called with the result before the messages are committed,
+                so callers can persist their own state in the same transaction
+        Returns:
+            Chat result with session ID, response, search results and model
+        """
+        # Create new session if none exists
+        if not session_id:
+            new_session = ChatSession(title=message[:50])  # Use first 50 chars as title
+            db.add(new_session)
+            await db.flush()
+            session_id = new_session.id
+            if on_session_created:
+                on_session_created(session_id)
+            await db.commit()
+            listing_cache.invalidate_sessions()
+            logger.info(f"[Step 2] Created new session with ID: {session_id}")
+
+        # Perform web search
+        logger.info("[Step 3] Starting web search...")
+        search_results = await search_service.search(message)
+        logger.info(f"[Step 4] Completed web search, got {len(search_results)} results")
+
+        # Store user message
+        user_message = Message(
+            session_id=session_id,
+            role="user",
+            content=message,
+            search_results=json.dumps(search_results)
+        )
+        db.add(user_message)
+        logger.info("[Step 5] Stored user message")
+
+        # Prepare context for AI
+        context = f"Web search results:\n"
+        # 只使用前3条最相关的搜索结果
+        for i, result in enumerate(search_results[:3]):
+            context += f"{i+1}. {result['title']}\n{result['snippet']}\n\n"
+
+        # Get AI response
+        messages = [
+            {"role": "system", "content": "You are a helpful AI assistant. Use the provided web search results to help answer questions accurately. Keep your response concise and focused."},
+            {"role": "user", "content": f"Context: {context}\n\nQuestion: {message}"}
+        ]
+
+        logger.info(f"[Step 6] Starting AI request using model: {model or settings.DEFAULT_MODEL}")
+        logger.info(f"[Step 6.1] Context length: {len(context)} chars")
+        ai_response = await ai_service.get_ai_response(messages, model)
+        logger.info("[Step 7] Received AI response")
+
+        # Store AI response
+        assistant_message = Message(
+            session_id=session_id,
+            role="assistant",
+            content=ai_response,
+            ai_model_response=json.dumps({
+                "response": ai_response,
+                "model": model or settings.DEFAULT_MODEL
+            })
+        )
+        db.add(assistant_message)
+
+        result = {
+            "session_id": session_id,
+            "response": ai_response,
+            "search_results": search_results,
+            "model": model or settings.DEFAULT_MODEL
+        }
+        if before_commit:
+            before_commit(result)
+
+        await db.commit()
+        listing_cache.invalidate_session(session_id)
+        logger.info("[Step 8] Stored AI response in database")
+
+        return result
+
+chat_service = ChatService()
@@ -0,0 +1,254 @@
+from fastapi import HTTPException
+from sqlalchemy import select, insert, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection
+from typing import AsyncIterator, BinaryIO, List, Dict, Any, Optional, Set
+from datetime import datetime, timezone
+import json
+import logging
+
+from ..database import engine
+from ..models import ChatSession, Message
+from .cache_service import listing_cache
+
+logger = logging.getLogger(__name__)
+
+# 导出时每次从游标拉取的行数
+EXPORT_BATCH_SIZE = 1000
+# 导入时每次 executemany 插入的行数
+IMPORT_BATCH_SIZE = 1000
+# 导入时每写入多少批提交一次事务，限制单次持有写锁的时间
+IMPORT_COMMIT_BATCHES = 10
+
+def _encode_row(record_type: str, row: Dict[str, Any]) -> str:
+    data = {"type": record_type}
+    for key, value in row.items():
+        data[key] = value.isoformat() if isinstance(value, datetime) else value
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+def _parse_datetime(value: Optional[str]) -> datetime:
+    if not value:
+        return datetime.now(timezone.utc)
+    return datetime.fromisoformat(value)
+
+class HistoryService:
+    async def export_ndjson(self, session_id: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Stream sessions followed by their messages as NDJSON lines
+        Args:
+            session_id: Only export this session if given
+        Returns:
+            Async iterator of NDJSON lines
+        """
+        sessions = ChatSession.__table__
+        messages = Message.__table__
+
+        session_query = select(sessions).order_by(sessions.c.id)
+        # 只导出所属会话存在的消息，孤立消息无法被导入
+        message_query = (
+            select(messages)
+            .join(sessions, messages.c.session_id == sessions.c.id)
+            .order_by(messages.c.session_id, messages.c.id)
+        )
+        if session_id is not None:
+            session_query = session_query.where(sessions.c.id == session_id)
+            message_query = message_query.where(messages.c.session_id == session_id)
+
+        # 使用服务端游标逐批读取，内存占用与历史大小无关
+        async with engine.connect() as conn:
+            # 两次查询放在同一个读事务里，保证看到同一份快照
+            if conn.dialect.name == "sqlite":
+                await conn.exec_driver_sql("BEGIN")
+            else:
+                await conn.execution_options(isolation_level="REPEATABLE READ")
+
+            session_count = 0
+            result = await conn.stream(
+                session_query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for row in result.mappings():
+                session_count += 1
+                yield _encode_row("session", row)
+
+            message_count = 0
+            result = await conn.stream(
+                message_query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for row in result.mappings():
+                message_count += 1
+                yield _encode_row("message", row)
+
+        logger.info(f"[History] Exported {session_count} sessions and {message_count} messages")
+
+    async def import_ndjson(self, file: BinaryIO) -> Dict[str, int]:
+        """
+        Bulk import NDJSON produced by export_ndjson.
+        The whole file is validated first, then written in transactions of
+        IMPORT_COMMIT_BATCHES batches so chat writes are not blocked for the
+        duration of the import. IDs are reassigned after the current maximum.
+        Args:
+            file: Fully received NDJSON file opened in binary mode, seekable
+        Returns:
+            Number of imported sessions and messages
+        """
+        # 第一遍只做校验，格式错误的文件不会写入任何数据
+        imported_sessions: Set[int] = set()
+        for line_number, raw_line in enumerate(file, start=1):
+            self._parse_line(line_number, raw_line, imported_sessions)
+        file.seek(0)
+
+        # 文件中的会话 ID -> 新会话 ID
+        session_ids: Dict[int, int] = {}
+        session_batch: List[Dict[str, Any]] = []
+        message_batch: List[Dict[str, Any]] = []
+        # 记录每批数据来自的行号，插入冲突时用于定位
+        session_lines: List[int] = []
+        message_lines: List[int] = []
+        counts = {"sessions": 0, "messages": 0}
+
+        try:
+            async with engine.connect() as conn:
+                next_ids = await self._begin_chunk(conn)
+                chunk_batches = 0
+
+                async def flush_sessions():
+                    if session_batch:
+                        for row in session_batch:
+                            session_ids[row["id"]] = next_ids["session"]
+                            row["id"] = next_ids["session"]
+                            next_ids["session"] += 1
+                        await self._insert_batch(conn, ChatSession, session_batch, session_lines)
+                        counts["sessions"] += len(session_batch)
+                        session_batch.clear()
+                        session_lines.clear()
+
+                async def flush_messages():
+                    # 先写入会话，保证消息引用的会话已有新 ID
+                    await flush_sessions()
+                    if message_batch:
+                        for row in message_batch:
+                            row["id"] = next_ids["message"]
+                            row["session_id"] = session_ids[row["session_id"]]
+                            next_ids["message"] += 1
+                        await self._insert_batch(conn, Message, message_batch, message_lines)
+                        counts["messages"] += len(message_batch)
+                        message_batch.clear()
+                        message_lines.clear()
+
+                for line_number, raw_line in enumerate(file, start=1):
+                    record = self._parse_line(line_number, raw_line, None)
+                    if record is None:
+                        continue
+                    if record.pop("type") == "session":
+                        session_lines.append(line_number)
+                        session_batch.append(record)
+                    else:
+                        message_lines.append(line_number)
+                        message_batch.append(record)
+
+                    if len(session_batch) >= IMPORT_BATCH_SIZE:
+                        await flush_sessions()
+                        chunk_batches += 1
+                    if len(message_batch) >= IMPORT_BATCH_SIZE:
+                        await flush_messages()
+                        chunk_batches += 1
+
+                    # 定期提交释放写锁，让聊天和任务的写入可以穿插进来
+                    if chunk_batches >= IMPORT_COMMIT_BATCHES:
+                        await conn.commit()
+                        listing_cache.invalidate_all()
+                        next_ids = await self._begin_chunk(conn)
+                        chunk_batches = 0
+
+                await flush_messages()
+                await conn.commit()
+        finally:
+            listing_cache.invalidate_all()
+
+        logger.info(f"[History] Imported {counts['sessions']} sessions and {counts['messages']} messages")
+        return counts
+
+    def _parse_line(
+        self,
+        line_number: int,
+        raw_line: bytes,
+        imported_sessions: Optional[Set[int]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Parse one NDJSON line into a row, checking session references when
+        imported_sessions is given. Returns None for blank lines.
+        """
+        try:
+            line = raw_line.decode("utf-8").strip()
+            if not line:
+                return None
+            record = json.loads(line)
+            record_type = record.get("type")
+            if record_type == "session":
+                if not isinstance(record["id"], int):
+                    raise ValueError(f"invalid session id {record['id']!r}")
+                if imported_sessions is not None:
+                    if record["id"] in imported_sessions:
+                        raise ValueError(f"duplicate session id {record['id']}")
+                    imported_sessions.add(record["id"])
+                return {
+                    "type": "session",
+                    "id": record["id"],
+                    "created_at": _parse_datetime(record.get("created_at")),
+                    "title": record.get("title")
+                }
+            if record_type == "message":
+                if imported_sessions is not None and record["session_id"] not in imported_sessions:
+                    raise ValueError(f"unknown session {record['session_id']}")
+                return {
+                    "type": "message",
+                    "session_id": record["session_id"],
+                    "role": record.get("role"),
+                    "content": record.get("content"),
+                    "created_at": _parse_datetime(record.get("created_at")),
+                    "search_results": record.get("search_results"),
+                    "ai_model_response": record.get("ai_model_response")
+                }
+            raise ValueError(f"unknown record type {record_type!r}")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.error(f"[History] Invalid record on line {line_number}: {str(e)}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid record on line {line_number}: {str(e)}"
+            )
+
+    async def _begin_chunk(self, conn: AsyncConnection) -> Dict[str, int]:
+        """
+        Start a write transaction and return the next free session and message IDs
+        """
+        await conn.begin()
+        # pysqlite 直到第一条 INSERT 才发出 BEGIN，需先显式获取写锁，
+        # 否则读取最大 ID 与写入之间可能被其他写入占用 ID
+        if conn.dialect.name == "sqlite":
+            await conn.exec_driver_sql("BEGIN IMMEDIATE")
+        return {
+            "session": await self._max_id(conn, ChatSession) + 1,
+            "message": await self._max_id(conn, Message) + 1
+        }
+
+    async def _insert_batch(
+        self,
+        conn: AsyncConnection,
+        model,
+        batch: List[Dict[str, Any]],
+        lines: List[int]
+    ):
+        try:
+            await conn.execute(insert(model.__table__), batch)
+        except IntegrityError as e:
+            logger.error(f"[History] Conflicting record on lines {lines[0]}-{lines[-1]}: {str(e.orig)}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Conflicting record on lines {lines[0]}-{lines[-1]}: {str(e.orig)}"
+            )
+
+    async def _max_id(self, conn: AsyncConnection, model) -> int:
+        result = await conn.execute(select(func.max(model.id)))
+        return result.scalar() or 0
+
+history_service = HistoryService()
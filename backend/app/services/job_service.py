@@ -0,0 +1,309 @@
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timezone
+import asyncio
+import json
+import logging
+import uuid
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..models import ChatJob
+from .chat_service import chat_service
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# 数据库繁忙时写入失败状态的重试次数及基础间隔（秒）
+FAIL_RETRIES = 3
+RETRY_DELAY = 1.0
+
+def serialize_job(job: ChatJob) -> Dict[str, Any]:
+    """
+    Convert a chat job row into a JSON friendly dict
+    """
+    return {
+        "id": job.id,
+        "status": job.status,
+        "message": job.message,
+        "model": job.model or settings.DEFAULT_MODEL,
+        "session_id": job.session_id,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error
+    }
+
+class JobService:
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        # 数据库中仍有未放入队列的待处理任务
+        self._has_backlog = False
+
+    async def start(self):
+        """
+        Start the worker pool and re-queue jobs left unfinished by a previous run,
+        jobs that do not fit in the queue stay pending and are picked up later
+        """
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async with AsyncSessionLocal() as db:
+            # 上次进程退出时正在运行的任务重新排队
+            await db.execute(
+                update(ChatJob)
+                .where(ChatJob.status == "running")
+                .values(status="pending", started_at=None)
+            )
+            await db.commit()
+            result = await db.execute(
+                select(ChatJob.id)
+                .where(ChatJob.status == "pending")
+                .order_by(ChatJob.created_at)
+            )
+            pending_ids = result.scalars().all()
+
+        for job_id in pending_ids:
+            if self._queue.full():
+                self._has_backlog = True
+                break
+            self._queue.put_nowait(job_id)
+
+        self._tasks = [
+            asyncio.create_task(self._worker(i))
+            for i in range(self.workers)
+        ]
+        logger.info(f"[Jobs] Started {self.workers} workers, re-queued {len(pending_ids)} pending jobs")
+
+    async def stop(self):
+        """
+        Cancel all workers, unfinished jobs stay pending in the database
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("[Jobs] Workers stopped")
+
+    async def submit(
+        self,
+        db: AsyncSession,
+        message: str,
+        model: Optional[str] = None,
+        session_id: Optional[int] = None
+    ) -> ChatJob:
+        """
+        Persist a new chat job and put it on the worker queue
+        Args:
+            db: Database session
+            message: User message
+            model: Name of the model to use
+            session_id: Existing session ID, a new session is created if empty
+        Returns:
+            The created job
+        """
+        if self._queue is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Job workers are not running."
+            )
+        if self._queue.full():
+            logger.warning("[Jobs] Queue is full, rejecting job")
+            raise HTTPException(
+                status_code=503,
+                detail="Too many pending jobs, please retry later."
+            )
+
+        job = ChatJob(
+            id=str(uuid.uuid4()),
+            status="pending",
+            message=message,
+            model=model,
+            session_id=session_id
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+
+        # 提交期间其他请求可能已占满队列，不能阻塞等待空位
+        try:
+            self._queue.put_nowait(job.id)
+        except asyncio.QueueFull:
+            logger.warning(f"[Jobs] Queue filled up while submitting job {job.id}, rejecting it")
+            await self._fail_job(job.id, "Job queue is full", db)
+            raise HTTPException(
+                status_code=503,
+                detail="Too many pending jobs, please retry later."
+            )
+        logger.info(f"[Jobs] Queued job {job.id}, queue size: {self._queue.qsize()}")
+        return job
+
+    async def get_job(self, db: AsyncSession, job_id: str) -> ChatJob:
+        """
+        Load a job or raise 404
+        """
+        job = await db.get(ChatJob, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """
+        Register a listener that receives the job's state on every status change
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        listeners = self._subscribers.get(job_id, [])
+        if queue in listeners:
+            listeners.remove(queue)
+        if not listeners:
+            self._subscribers.pop(job_id, None)
+
+    def _publish(self, job: ChatJob):
+        self._publish_data(job.id, serialize_job(job))
+
+    def _publish_data(self, job_id: str, data: Dict[str, Any]):
+        for queue in self._subscribers.get(job_id, []):
+            queue.put_nowait(data)
+
+    async def _worker(self, index: int):
+        logger.info(f"[Jobs] Worker {index} started")
+        while True:
+            try:
+                job_id = await self._next_job_id()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 数据库暂时不可用（例如被锁），稍后再从积压中取任务
+                logger.error(f"[Jobs] Worker {index} failed to fetch next job: {str(e)}")
+                await asyncio.sleep(RETRY_DELAY)
+                continue
+            try:
+                await self._run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Jobs] Worker {index} failed on job {job_id}: {str(e)}")
+
+    async def _next_job_id(self) -> str:
+        # 队列空闲时先从数据库按提交顺序取出恢复时未能入队的任务
+        if self._has_backlog and self._queue.empty():
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(ChatJob.id)
+                    .where(ChatJob.status == "pending")
+                    .order_by(ChatJob.created_at)
+                    .limit(1)
+                )
+                job_id = result.scalar()
+            if job_id is not None:
+                return job_id
+            self._has_backlog = False
+            logger.info("[Jobs] Recovered backlog drained")
+        return await self._queue.get()
+
+    async def _run_job(self, job_id: str):
+        try:
+            claimed = await self._claim_job(job_id)
+        except Exception as e:
+            # 任务已出队但仍为 pending，交给数据库积压扫描重新获取
+            logger.error(f"[Jobs] Failed to claim job {job_id}: {str(e)}")
+            self._has_backlog = True
+            await asyncio.sleep(RETRY_DELAY)
+            return
+        if not claimed:
+            return
+
+        try:
+            await self._execute_job(job_id)
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"[Jobs] Job {job_id} failed: {error}")
+            await self._fail_job(job_id, error)
+
+    async def _claim_job(self, job_id: str) -> bool:
+        async with AsyncSessionLocal() as db:
+            # 原子地认领任务，同一任务可能同时出现在队列和数据库积压中
+            claim = await db.execute(
+                update(ChatJob)
+                .where(ChatJob.id == job_id, ChatJob.status == "pending")
+                .values(status="running", started_at=datetime.now(timezone.utc))
+            )
+            await db.commit()
+            if claim.rowcount != 1:
+                return False
+
+            job = await db.get(ChatJob, job_id)
+            self._publish(job)
+            logger.info(f"[Jobs] Running job {job_id}")
+            return True
+
+    async def _execute_job(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(ChatJob, job_id)
+
+            # 新会话与任务的 session_id 一起提交，重跑时沿用同一会话
+            def on_session_created(session_id: int):
+                job.session_id = session_id
+
+            # 任务结果与聊天消息在同一事务中提交，重跑时不会写入重复消息
+            def before_commit(result: Dict[str, Any]):
+                job.status = "completed"
+                job.result = json.dumps(result)
+                job.finished_at = datetime.now(timezone.utc)
+
+            await chat_service.process_chat(
+                db,
+                job.message,
+                model=job.model,
+                session_id=job.session_id,
+                on_session_created=on_session_created,
+                before_commit=before_commit
+            )
+            self._publish(job)
+            logger.info(f"[Jobs] Job {job_id} completed")
+
+    async def _fail_job(self, job_id: str, error: str, db: Optional[AsyncSession] = None):
+        """
+        Mark a job failed, retrying in fresh sessions if the database is busy.
+        Subscribers always receive the failed state so SSE streams terminate.
+        """
+        failed_job: Optional[ChatJob] = None
+        for attempt in range(FAIL_RETRIES):
+            try:
+                if db is not None and attempt == 0:
+                    failed_job = await self._write_failure(db, job_id, error)
+                else:
+                    async with AsyncSessionLocal() as fresh_db:
+                        failed_job = await self._write_failure(fresh_db, job_id, error)
+                self._publish(failed_job)
+                return
+            except Exception as e:
+                logger.error(f"[Jobs] Failed to mark job {job_id} failed (attempt {attempt + 1}): {str(e)}")
+                await asyncio.sleep(RETRY_DELAY * (attempt + 1))
+
+        # 状态未能写入数据库（重启时会重新排队），但仍通知订阅者结束等待
+        data = serialize_job(failed_job) if failed_job is not None else {"id": job_id, "status": "failed"}
+        data.update(status="failed", error=error)
+        self._publish_data(job_id, data)
+
+    async def _write_failure(self, db: AsyncSession, job_id: str, error: str) -> ChatJob:
+        await db.rollback()
+        job = await db.get(ChatJob, job_id)
+        job.status = "failed"
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+        await db.commit()
+        return job
+
+job_service = JobService(settings.CHAT_JOB_WORKERS, settings.CHAT_JOB_QUEUE_SIZE)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# app.config 在导入时读取这些配置，测试中不需要真实的 API Key
+os.environ.setdefault("SILICONFLOW_API_KEY", "test")
+os.environ.setdefault("SEARCH1API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,157 @@
+from fastapi import HTTPException
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine
+import asyncio
+import io
+import json
+import pytest
+
+from app.models import Base, ChatSession, Message
+from app.services import history_service as history_module
+from app.services.history_service import history_service
+
+def run(coro):
+    return asyncio.run(coro)
+
+async def _create_engine():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+async def _seed(engine, sessions, messages):
+    async with engine.begin() as conn:
+        await conn.execute(ChatSession.__table__.insert(), sessions)
+        await conn.execute(Message.__table__.insert(), messages)
+
+async def _export(engine) -> bytes:
+    history_module.engine = engine
+    lines = [line async for line in history_service.export_ndjson()]
+    return "".join(lines).encode("utf-8")
+
+async def _count(engine, model) -> int:
+    async with engine.connect() as conn:
+        result = await conn.execute(select(func.count()).select_from(model.__table__))
+        return result.scalar()
+
+@pytest.fixture(autouse=True)
+def restore_engine(monkeypatch):
+    monkeypatch.setattr(history_module, "engine", history_module.engine)
+    # 小批量且每批提交，让测试覆盖多次 flush、多个事务及会话先于消息写入的顺序
+    monkeypatch.setattr(history_module, "IMPORT_BATCH_SIZE", 2)
+    monkeypatch.setattr(history_module, "IMPORT_COMMIT_BATCHES", 1)
+
+def test_export_import_round_trip_shifts_ids():
+    async def scenario():
+        source = await _create_engine()
+        await _seed(
+            source,
+            [{"id": 1, "title": "first"}, {"id": 2, "title": "second"}, {"id": 3, "title": "third"}],
+            [
+                {"id": 1, "session_id": 1, "role": "user", "content": "q1"},
+                {"id": 2, "session_id": 1, "role": "assistant", "content": "a1"},
+                {"id": 3, "session_id": 3, "role": "user", "content": "q3"},
+                {"id": 4, "session_id": None, "role": "user", "content": "orphan"},
+            ]
+        )
+        data = await _export(source)
+        records = [json.loads(line) for line in data.decode("utf-8").splitlines()]
+        assert [r["type"] for r in records] == ["session"] * 3 + ["message"] * 3
+
+        target = await _create_engine()
+        await _seed(
+            target,
+            [{"id": 1, "title": "existing"}, {"id": 5, "title": "existing"}],
+            [{"id": 1, "session_id": 1, "role": "user", "content": "kept"},
+             {"id": 7, "session_id": 5, "role": "user", "content": "kept"}]
+        )
+        history_module.engine = target
+        counts = await history_service.import_ndjson(io.BytesIO(data))
+        assert counts == {"sessions": 3, "messages": 3}
+
+        async with target.connect() as conn:
+            sessions = (await conn.execute(
+                select(ChatSession.id, ChatSession.title).order_by(ChatSession.id)
+            )).all()
+            messages = (await conn.execute(
+                select(Message.id, Message.session_id, Message.content).order_by(Message.id)
+            )).all()
+
+        assert sessions == [
+            (1, "existing"), (5, "existing"),
+            (6, "first"), (7, "second"), (8, "third"),
+        ]
+        assert messages == [
+            (1, 1, "kept"), (7, 5, "kept"),
+            (8, 6, "q1"), (9, 6, "a1"), (10, 8, "q3"),
+        ]
+        await source.dispose()
+        await target.dispose()
+
+    run(scenario())
+
+def test_import_rolls_back_on_bad_last_line():
+    async def scenario():
+        engine = await _create_engine()
+        history_module.engine = engine
+        lines = [
+            {"type": "session", "id": 1, "title": "s1"},
+            {"type": "session", "id": 2, "title": "s2"},
+            {"type": "session", "id": 3, "title": "s3"},
+            {"type": "message", "id": 1, "session_id": 1, "content": "m1"},
+            {"type": "message", "id": 2, "session_id": 2, "content": "m2"},
+            {"type": "message", "id": 3, "session_id": 3, "content": "m3"},
+        ]
+        data = "".join(json.dumps(line) + "\n" for line in lines) + "{not json\n"
+
+        with pytest.raises(HTTPException) as exc_info:
+            await history_service.import_ndjson(io.BytesIO(data.encode("utf-8")))
+        assert exc_info.value.status_code == 400
+        assert "line 7" in exc_info.value.detail
+
+        assert await _count(engine, ChatSession) == 0
+        assert await _count(engine, Message) == 0
+        await engine.dispose()
+
+    run(scenario())
+
+def test_import_allocates_ids_after_writes_between_chunks(monkeypatch):
+    async def scenario():
+        engine = await _create_engine()
+        history_module.engine = engine
+        begin_chunk = history_service._begin_chunk
+        calls = []
+
+        # 模拟两次提交之间有聊天写入新会话
+        async def begin_chunk_with_concurrent_write(conn):
+            calls.append(1)
+            if len(calls) > 1:
+                await conn.execute(ChatSession.__table__.insert().values(title="concurrent"))
+                await conn.commit()
+            return await begin_chunk(conn)
+
+        monkeypatch.setattr(history_service, "_begin_chunk", begin_chunk_with_concurrent_write)
+        lines = [{"type": "session", "id": i, "title": f"s{i}"} for i in (10, 20, 30)]
+        lines += [{"type": "message", "id": i, "session_id": i * 10, "content": f"m{i}"} for i in (1, 2, 3)]
+        data = "".join(json.dumps(line) + "\n" for line in lines)
+
+        counts = await history_service.import_ndjson(io.BytesIO(data.encode("utf-8")))
+        assert counts == {"sessions": 3, "messages": 3}
+        assert len(calls) > 1
+
+        async with engine.connect() as conn:
+            titles = (await conn.execute(
+                select(ChatSession.title).order_by(ChatSession.id)
+            )).scalars().all()
+            pairs = (await conn.execute(
+                select(Message.content, ChatSession.title)
+                .join(ChatSession, Message.session_id == ChatSession.id)
+                .order_by(Message.id)
+            )).all()
+
+        assert sorted(t for t in titles if t != "concurrent") == ["s10", "s20", "s30"]
+        assert "concurrent" in titles
+        assert pairs == [("m1", "s10"), ("m2", "s20"), ("m3", "s30")]
+        await engine.dispose()
+
+    run(scenario())
@@ -0,0 +1,185 @@
+from fastapi import HTTPException
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+import asyncio
+import pytest
+
+from app.models import Base, ChatJob, ChatSession, Message
+from app.services import job_service as job_module
+from app.services.ai_service import ai_service
+from app.services.job_service import JobService
+from app.services.search_service import search_service
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture(autouse=True)
+def fake_services(monkeypatch):
+    async def search(query):
+        return [{"title": "result", "snippet": "snippet", "link": "https://example.com"}]
+
+    async def get_ai_response(messages, model_name=None):
+        return "answer"
+
+    monkeypatch.setattr(search_service, "search", search)
+    monkeypatch.setattr(ai_service, "get_ai_response", get_ai_response)
+    monkeypatch.setattr(job_module, "RETRY_DELAY", 0.01)
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    # 工作协程会并发使用多个连接，这里用文件数据库而不是共享单连接的内存数据库
+    async def create():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        monkeypatch.setattr(job_module, "AsyncSessionLocal", factory)
+        return engine, factory
+    return create
+
+async def _add_jobs(factory, jobs):
+    async with factory() as db:
+        for job in jobs:
+            db.add(job)
+        await db.commit()
+
+async def _wait_for(factory, condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        async with factory() as db:
+            jobs = (await db.execute(select(ChatJob))).scalars().all()
+        if condition(jobs):
+            return jobs
+        assert asyncio.get_running_loop().time() < deadline, [job.status for job in jobs]
+        await asyncio.sleep(0.02)
+
+async def _count(factory, model) -> int:
+    async with factory() as db:
+        return (await db.execute(select(func.count()).select_from(model))).scalar()
+
+def test_start_recovers_jobs_beyond_queue_size(database):
+    async def scenario():
+        engine, factory = await database()
+        await _add_jobs(factory, [
+            ChatJob(id=f"job-{i}", status="running" if i == 0 else "pending", message=f"q{i}")
+            for i in range(6)
+        ])
+
+        service = JobService(workers=2, queue_size=2)
+        await service.start()
+        try:
+            jobs = await _wait_for(factory, lambda jobs: all(j.status == "completed" for j in jobs))
+        finally:
+            await service.stop()
+
+        assert len(jobs) == 6
+        assert all(job.session_id is not None and job.result for job in jobs)
+        # 每个任务恰好执行一次：一问一答
+        assert await _count(factory, Message) == 12
+        await engine.dispose()
+
+    run(scenario())
+
+def test_submit_rejects_job_when_queue_fills_during_commit(database):
+    async def scenario():
+        engine, factory = await database()
+        service = JobService(workers=1, queue_size=1)
+        service._queue = asyncio.Queue(maxsize=1)
+
+        async with factory() as db:
+            commit = db.commit
+
+            # 模拟提交期间另一个请求占满队列
+            async def commit_and_fill():
+                await commit()
+                if service._queue.empty():
+                    service._queue.put_nowait("other")
+
+            db.commit = commit_and_fill
+            with pytest.raises(HTTPException) as exc_info:
+                await asyncio.wait_for(service.submit(db, "question"), timeout=1.0)
+
+        assert exc_info.value.status_code == 503
+        jobs = await _wait_for(factory, lambda jobs: len(jobs) == 1)
+        assert jobs[0].status == "failed"
+        await engine.dispose()
+
+    run(scenario())
+
+def test_claim_failure_returns_job_to_backlog(database, monkeypatch):
+    async def scenario():
+        engine, factory = await database()
+        await _add_jobs(factory, [ChatJob(id="job-1", status="pending", message="q")])
+        service = JobService(workers=1, queue_size=1)
+        service._queue = asyncio.Queue(maxsize=1)
+
+        async def locked(job_id):
+            raise RuntimeError("database is locked")
+
+        monkeypatch.setattr(service, "_claim_job", locked)
+        await service._run_job("job-1")
+
+        assert service._has_backlog
+        assert await service._next_job_id() == "job-1"
+        await engine.dispose()
+
+    run(scenario())
+
+def test_failed_state_is_published_when_it_cannot_be_stored(database, monkeypatch):
+    async def scenario():
+        engine, factory = await database()
+        await _add_jobs(factory, [ChatJob(id="job-1", status="running", message="q")])
+        service = JobService(workers=1, queue_size=1)
+
+        async def locked(db, job_id, error):
+            raise RuntimeError("database is locked")
+
+        monkeypatch.setattr(service, "_write_failure", locked)
+        events = service.subscribe("job-1")
+        await service._fail_job("job-1", "boom")
+
+        event = events.get_nowait()
+        assert event["status"] == "failed"
+        assert event["error"] == "boom"
+        await engine.dispose()
+
+    run(scenario())
+
+def test_rerun_after_failure_reuses_the_created_session(database, monkeypatch):
+    async def scenario():
+        engine, factory = await database()
+        await _add_jobs(factory, [ChatJob(id="job-1", status="pending", message="q")])
+        service = JobService(workers=1, queue_size=1)
+        ai_available = False
+
+        async def get_ai_response(messages, model_name=None):
+            if not ai_available:
+                raise HTTPException(status_code=504, detail="timeout")
+            return "answer"
+
+        monkeypatch.setattr(ai_service, "get_ai_response", get_ai_response)
+        await service._run_job("job-1")
+
+        async with factory() as db:
+            job = await db.get(ChatJob, "job-1")
+            assert job.status == "failed"
+            assert job.error == "timeout"
+            session_id = job.session_id
+            assert session_id is not None
+            # 模拟重启后重新排队
+            job.status = "pending"
+            await db.commit()
+
+        ai_available = True
+        await service._run_job("job-1")
+
+        async with factory() as db:
+            job = await db.get(ChatJob, "job-1")
+            assert job.status == "completed"
+            assert job.session_id == session_id
+        assert await _count(factory, ChatSession) == 1
+        assert await _count(factory, Message) == 2
+        await engine.dispose()
+
+    run(scenario())
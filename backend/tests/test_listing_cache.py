@@ -0,0 +1,103 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+import asyncio
+import pytest
+
+from app.database import get_db
+from app.main import app
+from app.models import Base
+from app.services.ai_service import ai_service
+from app.services.cache_service import ListingCache, listing_cache, messages_key
+from app.services.search_service import search_service
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    async def search(query):
+        return [{"title": "result", "snippet": "snippet", "link": "https://example.com"}]
+
+    async def get_ai_response(messages, model_name=None):
+        return "answer"
+
+    monkeypatch.setattr(search_service, "search", search)
+    monkeypatch.setattr(ai_service, "get_ai_response", get_ai_response)
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}")
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        # TestClient 在自己的事件循环中运行，不复用这里建立的连接
+        await engine.dispose()
+
+    asyncio.run(create_tables())
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with factory() as session:
+            yield session
+            await session.commit()
+
+    app.dependency_overrides[get_db] = override_get_db
+    listing_cache.invalidate_all()
+    # 不使用 with，避免触发启动事件中的 init_db 和任务 worker
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    listing_cache.invalidate_all()
+
+def test_sessions_returns_304_when_etag_matches(client):
+    response = client.get("/sessions/")
+    assert response.status_code == 200
+    assert response.json() == []
+    etag = response.headers["etag"]
+
+    response = client.get("/sessions/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+def test_weak_etag_in_list_matches(client):
+    etag = client.get("/sessions/").headers["etag"]
+
+    response = client.get("/sessions/", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+
+    response = client.get("/sessions/", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+def test_chat_write_invalidates_listings(client):
+    sessions_etag = client.get("/sessions/").headers["etag"]
+
+    response = client.post("/chat/", json={"message": "hello"})
+    assert response.status_code == 200
+    session_id = response.json()["session_id"]
+
+    response = client.get("/sessions/", headers={"If-None-Match": sessions_etag})
+    assert response.status_code == 200
+    assert [session["id"] for session in response.json()] == [session_id]
+
+    messages_url = f"/sessions/{session_id}/messages/"
+    response = client.get(messages_url)
+    assert [message["role"] for message in response.json()] == ["user", "assistant"]
+    messages_etag = response.headers["etag"]
+    assert client.get(messages_url, headers={"If-None-Match": messages_etag}).status_code == 304
+
+    client.post("/chat/", json={"message": "again", "session_id": session_id})
+    response = client.get(messages_url, headers={"If-None-Match": messages_etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 4
+
+def test_put_skips_store_when_version_changed_during_load():
+    cache = ListingCache(max_entries=2)
+    key = messages_key(1)
+    etag = cache.etag(key)
+
+    # 加载期间发生写入
+    cache.invalidate_session(1)
+    cache.put(key, etag, b"stale")
+    assert cache.get(key, etag) is None
+    assert cache.get(key, cache.etag(key)) is None
+
+    current = cache.etag(key)
+    cache.put(key, current, b"fresh")
+    assert cache.get(key, current) == b"fresh"